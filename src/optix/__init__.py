@@ -1,13 +1,22 @@
 from __future__ import annotations
 
-from collections.abc import Callable
+import collections
+import dataclasses
+import dis
+import functools
+import inspect
+import types
+import weakref
+from collections.abc import Callable, Iterable
 from dataclasses import dataclass
-from typing import Generic, Protocol, TypeVar, runtime_checkable
+from typing import Any, Generic, TypeVar
 
 import equinox as eqx
+import jax
+import jax.numpy as jnp
 
 
-__all__ = ["Lens", "FreeLens", "Lens", "Focused", "focus"]
+__all__ = ["Lens", "FreeLens", "ArrayLens", "FreeArrayLens", "Focused", "focus", "multi_set"]
 
 
 T = TypeVar("T")
@@ -15,7 +24,397 @@ S = TypeVar("S")
 U = TypeVar("U")
 
 
-class FreeLens(eqx.Module, Generic[T, S]):
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class _Compose:
+    """ The composition `inner(outer(obj))` of two accessors.
+
+    Kept as a value rather than a closure so that equal compositions
+    compare equal as static pytree data.
+    """
+
+    outer: Callable
+    inner: Callable
+
+    def __call__(self, obj):
+        return self.inner(self.outer(obj))
+
+
+_MISSING = object()
+
+# where -> {treedef: index of the focused leaf, or None if `where` does not
+# focus a single leaf}. Weakly keyed so that accessors are not kept alive.
+_LEAF_INDEX: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+# (where key, treedef) -> leaf index, for accessors whose behaviour is fully
+# determined by their code, keyed by `_where_key` so that source-identical
+# lambdas share entries. Least recently used entries are evicted.
+_LEAF_INDEX_BY_KEY: collections.OrderedDict = collections.OrderedDict()
+_LEAF_INDEX_BY_KEY_SIZE = 1024
+
+
+class _Marker:
+    """ Stands in for the leaf at `index` while probing an accessor.
+
+    Refuses truth tests and comparisons, so accessors that depend on the
+    value of a leaf cannot be resolved by probing.
+    """
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def _depends_on_leaf(self, *args):
+        raise TypeError("accessor depends on the value of a leaf")
+
+    __bool__ = __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = _depends_on_leaf
+    __hash__ = object.__hash__
+
+
+_NONLOCAL_LOADS = frozenset({
+    "LOAD_GLOBAL",
+    "LOAD_NAME",
+    "LOAD_DEREF",
+    "LOAD_CLASSDEREF",
+    "LOAD_FROM_DICT_OR_DEREF",
+    "LOAD_FROM_DICT_OR_GLOBALS",
+    "IMPORT_NAME",
+})
+
+
+def _reads_nonlocals(code: types.CodeType) -> bool:
+    """ Whether `code`, or any code nested in it, reads closures or globals. """
+    if code.co_freevars or any(i.opname in _NONLOCAL_LOADS for i in dis.get_instructions(code)):
+        return True
+    return any(isinstance(c, types.CodeType) and _reads_nonlocals(c) for c in code.co_consts)
+
+
+def _const_key(const) -> tuple:
+    """ A key for a code constant, distinguishing values that compare equal.
+
+    Tells apart e.g. `1`, `1.0` and `True`, or `0.0` and `-0.0`, also inside
+    nested tuples, frozensets and code objects.
+    """
+    if isinstance(const, types.CodeType):
+        return (types.CodeType, _code_parts(const))
+    if isinstance(const, (tuple, frozenset)):
+        return (type(const), type(const)(_const_key(c) for c in const))
+    if isinstance(const, (float, complex)):
+        return (type(const), repr(const))
+    return (type(const), const)
+
+
+def _code_parts(code: types.CodeType) -> tuple:
+    return (
+        code.co_argcount,
+        code.co_kwonlyargcount,
+        code.co_code,
+        tuple(_const_key(c) for c in code.co_consts),
+        code.co_names,
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _code_key(code: types.CodeType) -> tuple | None:
+    """ A value-based key for code that only depends on its arguments. """
+    if _reads_nonlocals(code):
+        return None
+    return _code_parts(code)
+
+
+def _where_key(where: Callable) -> tuple | None:
+    """ A key shared by all accessors that behave identically, if one exists.
+
+    Accessors reading globals, closures or defaults have no such key.
+    """
+    if type(where) is _Compose:
+        outer = _where_key(where.outer)
+        if outer is None:
+            return None
+        inner = _where_key(where.inner)
+        return None if inner is None else (outer, inner)
+    if (
+        type(where) is not types.FunctionType
+        or where.__defaults__ is not None
+        or where.__kwdefaults__ is not None
+    ):
+        return None
+    return _code_key(where.__code__)
+
+
+def _path_leaf_index(obj, path: tuple[str, ...]) -> int | None:
+    """ Index of the leaf of `obj` whose key path is the attribute path `path`. """
+    keys = tuple(jax.tree_util.GetAttrKey(name) for name in path)
+    leaves_with_paths, _ = jax.tree_util.tree_flatten_with_path(obj)
+    for index, (keypath, _) in enumerate(leaves_with_paths):
+        if keypath == keys:
+            return index
+    return None
+
+
+class _StaticWhere:
+    """ An accessor as static pytree data.
+
+    Compares equal for accessors sharing a `_where_key`, so passing a lens
+    built from a freshly created lambda into a jitted function does not
+    retrace.
+    """
+
+    __slots__ = ("where", "key")
+
+    def __init__(self, where: Callable):
+        self.where = where
+        key = _where_key(where)
+        self.key = where if key is None else key
+
+    def __eq__(self, other):
+        return isinstance(other, _StaticWhere) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+
+def _leaf_index(where: Callable, obj, leaves: list, treedef) -> int | None:
+    """ Find the leaf `where` focuses on in `obj`, whose flattening is `leaves, treedef`.
+
+    The slot is cached per accessor and structure and attribute-only
+    accessors are matched against the key paths of `obj` without being
+    called. Source-identical lambdas, e.g. ones recreated on every call of
+    a function, share the cached slot. Slots found by probing may depend on
+    closures or globals (also through properties), so they are checked
+    against `where(obj)`.
+    """
+    entry = _cached_leaf_index(where, obj, treedef)
+    if entry is None:
+        return None
+    index, structural = entry
+    if structural:
+        return index
+    found = where(obj)
+    if leaves[index] is not found or sum(leaf is found for leaf in leaves) != 1:
+        return None
+    return index
+
+
+def _cached_leaf_index(where: Callable, obj, treedef) -> tuple[int, bool] | None:
+    """ The cached `_resolve_leaf_index` of `where` for `treedef`. """
+    key = _where_key(where)
+    try:
+        if key is None:
+            cache = _LEAF_INDEX.setdefault(where, {})
+            return cache[treedef]
+        index = _LEAF_INDEX_BY_KEY[key, treedef]
+        _LEAF_INDEX_BY_KEY.move_to_end((key, treedef))
+        return index
+    except TypeError:
+        # `where` is not weak-referenceable or `treedef` is not hashable.
+        return None
+    except KeyError:
+        pass
+    entry = _resolve_leaf_index(where, obj, treedef)
+    if key is None:
+        cache[treedef] = entry
+    else:
+        _LEAF_INDEX_BY_KEY[key, treedef] = entry
+        if len(_LEAF_INDEX_BY_KEY) > _LEAF_INDEX_BY_KEY_SIZE:
+            _LEAF_INDEX_BY_KEY.popitem(last=False)
+    return entry
+
+
+def _resolve_leaf_index(where: Callable, obj, treedef) -> tuple[int, bool] | None:
+    """ Resolve the slot of `where` from key paths, or by probing with markers.
+
+    Returns `(index, structural)`, where `structural` tells whether the slot
+    was matched against key paths and so holds for every tree with this
+    structure, or None if `where` does not focus a single leaf.
+    """
+    path = _compile_where(where)
+    if path is not None:
+        index = _path_leaf_index(obj, path)
+        if index is not None:
+            return index, True
+    probe = treedef.unflatten([_Marker(i) for i in range(treedef.num_leaves)])
+    try:
+        found = where(probe)
+    except Exception:
+        found = None
+    return (found.index, False) if isinstance(found, _Marker) else None
+
+
+_LOAD_FAST = frozenset({"LOAD_FAST", "LOAD_FAST_BORROW"})
+
+
+@functools.lru_cache(maxsize=1024)
+def _attr_path(code: types.CodeType) -> tuple[str, ...] | None:
+    """ The attribute path of `lambda x: x.a.b...`, or None for any other code. """
+    if code.co_argcount != 1 or code.co_kwonlyargcount or code.co_flags & (
+        inspect.CO_VARARGS | inspect.CO_VARKEYWORDS
+    ):
+        return None
+    instructions = [i for i in dis.get_instructions(code) if i.opname not in ("RESUME", "NOP")]
+    if len(instructions) < 3:
+        return None
+    first, *body, last = instructions
+    if first.opname not in _LOAD_FAST or first.arg != 0 or last.opname != "RETURN_VALUE":
+        return None
+    path = []
+    for instruction in body:
+        # the low bit of LOAD_ATTR's arg marks a method load
+        if instruction.opname != "LOAD_ATTR" or instruction.arg & 1:
+            return None
+        path.append(instruction.argval)
+    return tuple(path)
+
+
+def _compile_where(where: Callable) -> tuple[str, ...] | None:
+    """ The static attribute path `where` reads, if it only reads attributes. """
+    if type(where) is _Compose:
+        outer = _compile_where(where.outer)
+        if outer is None:
+            return None
+        inner = _compile_where(where.inner)
+        return None if inner is None else outer + inner
+    if type(where) is not types.FunctionType:
+        return None
+    return _attr_path(where.__code__)
+
+
+@functools.lru_cache(maxsize=1024)
+def _dynamic_fields(cls: type) -> frozenset[str]:
+    """ Names of the non-static fields of an `eqx.Module` subclass; empty for other types. """
+    if not issubclass(cls, eqx.Module):
+        return frozenset()
+    return frozenset(
+        field.name for field in dataclasses.fields(cls) if not field.metadata.get("static", False)
+    )
+
+
+def _swap_field(node: eqx.Module, name: str, value) -> eqx.Module:
+    """ Copy of a module with one field replaced, bypassing `__init__` like unflattening does. """
+    new = object.__new__(type(node))
+    new.__dict__.update(node.__dict__)
+    object.__setattr__(new, name, value)
+    return new
+
+
+def _replace_path(obj, path: tuple[str, ...], replace=_MISSING, replace_fn=_MISSING):
+    """ Replace the value at an attribute path through nested modules.
+
+    Returns `_MISSING` if some node on the path is not an `eqx.Module` or the
+    attribute is not one of its dynamic fields.
+    """
+    nodes = [obj]
+    for name in path:
+        node = nodes[-1]
+        if name not in _dynamic_fields(type(node)):
+            return _MISSING
+        nodes.append(getattr(node, name))
+    old = nodes.pop()
+    value = replace if replace_fn is _MISSING else replace_fn(old)
+    if value is old:
+        return obj
+    for name in reversed(path):
+        value = _swap_field(nodes.pop(), name, value)
+    return value
+
+
+# Options of `jax.Array.at[...].get` that `.set` accepts as well.
+_SET_OPTIONS = frozenset({"mode", "indices_are_sorted", "unique_indices"})
+
+
+def _index_update(x: jax.Array, index, update: Callable, **kwargs) -> jax.Array:
+    """ Gather `x[index]`, apply `update` to it and scatter the result back.
+
+    All `kwargs` go to the gather; only the ones shared with `.set` (e.g. not
+    `fill_value`) go to the scatter.
+    """
+    set_kwargs = {k: v for k, v in kwargs.items() if k in _SET_OPTIONS}
+    return x.at[index].set(update(x.at[index].get(**kwargs)), **set_kwargs)
+
+
+# Kernels are keyed on `_StaticWhere(update)`, so that source-identical update
+# lambdas created on every call share one compiled kernel, and on the static
+# part of the index from `_split_index`; its array leaves are kernel arguments.
+@functools.lru_cache(maxsize=256)
+def _index_kernel(update: _StaticWhere, static_index: tuple, options: tuple) -> Callable:
+    fn = update.where
+
+    def kernel(x, arrays):
+        return _index_update(x, _merge_index(static_index, arrays), fn, **dict(options))
+
+    return jax.jit(kernel)
+
+
+def _is_hashable(obj) -> bool:
+    try:
+        hash(obj)
+    except TypeError:
+        return False
+    return True
+
+
+def _split_index(index) -> tuple[tuple, tuple]:
+    """ Split an index into static and array parts, like `eqx.partition`.
+
+    Returns `(static, arrays)`: `static` holds the index treedef and its
+    hashable leaves (ints, slices, `Ellipsis`, ...), with `_MISSING` where an
+    array leaf was; `arrays` holds the array leaves.
+    """
+    leaves, treedef = jax.tree_util.tree_flatten(index)
+    arrays = tuple(leaf for leaf in leaves if not _is_hashable(leaf))
+    parts = tuple(leaf if _is_hashable(leaf) else _MISSING for leaf in leaves)
+    return (treedef, parts), arrays
+
+
+def _merge_index(static: tuple, arrays) -> Any:
+    """ Inverse of `_split_index`. """
+    treedef, parts = static
+    arrays = iter(arrays)
+    return treedef.unflatten([next(arrays) if part is _MISSING else part for part in parts])
+
+
+def _flatten_index(children: tuple, where: Callable, index):
+    """ Flatten an array lens, keeping the non-array parts of the index as static aux data. """
+    static, arrays = _split_index(index)
+    return (*children, *arrays), (_StaticWhere(where), static, len(arrays))
+
+
+def _unflatten_index(aux, children) -> tuple[tuple, Callable, Any]:
+    """ Inverse of `_flatten_index`, returning `(children, where, index)`. """
+    static_where, static, num_arrays = aux
+    split = len(children) - num_arrays
+    return tuple(children[:split]), static_where.where, _merge_index(static, children[split:])
+
+
+def _tree_at_cached(where, obj, replace=_MISSING, replace_fn=_MISSING):
+    """ Like `eqx.tree_at`, but reuses the resolved leaf for known accessors.
+
+    Attribute paths through modules are replaced directly without flattening.
+    If the focused leaf is replaced by itself, `obj` is returned unchanged.
+    Falls back to `eqx.tree_at` whenever `where` does not focus a single
+    leaf, e.g. if it returns a subtree or a tuple of nodes.
+    """
+    path = _compile_where(where)
+    if path is not None:
+        new = _replace_path(obj, path, replace, replace_fn)
+        if new is not _MISSING:
+            return new
+    leaves, treedef = jax.tree_util.tree_flatten(obj)
+    index = _leaf_index(where, obj, leaves, treedef)
+    if index is None:
+        if replace_fn is _MISSING:
+            return eqx.tree_at(where, obj, replace=replace)
+        return eqx.tree_at(where, obj, replace_fn=replace_fn)
+    old = leaves[index]
+    leaves[index] = replace if replace_fn is _MISSING else replace_fn(old)
+    if leaves[index] is old:
+        return obj
+    return treedef.unflatten(leaves)
+
+
+@jax.tree_util.register_pytree_node_class
+@dataclass(frozen=True, slots=True)
+class FreeLens(Generic[T, S]):
     """ A lens that focuses on a value in an object.
 
     Args:
@@ -24,6 +423,13 @@ class FreeLens(eqx.Module, Generic[T, S]):
 
     where: Callable[[T], S]
 
+    def tree_flatten(self):
+        return (), _StaticWhere(self.where)
+
+    @classmethod
+    def tree_unflatten(cls, aux, children):
+        return cls(aux.where)
+
     def get(self, obj: T) -> S:
         """ Get the value of the focus in the object.
 
@@ -46,7 +452,7 @@ class FreeLens(eqx.Module, Generic[T, S]):
         Returns:
             A modified copy of the object.
         """
-        return eqx.tree_at(self.where, obj, val)
+        return _tree_at_cached(self.where, obj, replace=val)
     
     def apply(self, obj: T, update: Callable[[S], S]) -> T:
         """ Apply a function to the focused value in the object.
@@ -58,7 +464,7 @@ class FreeLens(eqx.Module, Generic[T, S]):
         Returns:
             A modified copy of the object.
         """
-        return eqx.tree_at(self.where, obj, replace=update(self.get(obj)))
+        return _tree_at_cached(self.where, obj, replace_fn=update)
     
     def bind(self, obj: T) -> Lens[T, S]:
         """ Bind the lens to an object.
@@ -71,8 +477,32 @@ class FreeLens(eqx.Module, Generic[T, S]):
         """
         return Lens(obj, self.where)
 
+    def then(self, other: FreeLens[S, U]) -> FreeLens[T, U]:
+        """ Compose with a lens that focuses further into the focused value.
+
+        Args:
+            other: A lens on the focused value.
+
+        Returns:
+            A lens focusing through both accessors in a single traversal.
+        """
+        return FreeLens(_Compose(self.where, other.where))
+
+    def at_index(self, index) -> FreeArrayLens[T, S]:
+        """ Focus on an index of the focused array(s).
+
+        Args:
+            index: Any index supported by `jax.Array.at`.
+
+        Returns:
+            An array lens.
+        """
+        return FreeArrayLens(self.where, index)
+
 
-class Lens(eqx.Module, Generic[T, S]):
+@jax.tree_util.register_pytree_node_class
+@dataclass(frozen=True, slots=True)
+class Lens(Generic[T, S]):
     """ A lens that focuses on a value in a bound object.
 
     Args:
@@ -83,6 +513,14 @@ class Lens(eqx.Module, Generic[T, S]):
     obj: T
     where: Callable[[T], S]
 
+    def tree_flatten(self):
+        return (self.obj,), _StaticWhere(self.where)
+
+    @classmethod
+    def tree_unflatten(cls, aux, children):
+        (obj,) = children
+        return cls(obj, aux.where)
+
     def get(self) -> S:
         """ Get the value of the focus in the object.
 
@@ -100,7 +538,7 @@ class Lens(eqx.Module, Generic[T, S]):
         Returns:
             A modified copy of the object.
         """
-        return eqx.tree_at(self.where, self.obj, replace=val)
+        return _tree_at_cached(self.where, self.obj, replace=val)
     
     def apply(self, update: Callable[[S], S]) -> T:
         """ Apply a function to the focused value in the object.
@@ -111,16 +549,268 @@ class Lens(eqx.Module, Generic[T, S]):
         Returns:
             A modified copy of the object.
         """
-        return eqx.tree_at(self.where, self.obj, replace=update(self.get()))
+        return _tree_at_cached(self.where, self.obj, replace_fn=update)
+
+    def replace_if(self, pred, update: Callable[[S], S]) -> T:
+        """ Apply a function to the focused value where a condition holds.
+
+        Lowers to `jnp.where` rather than a scatter, so it fuses with
+        surrounding elementwise operations.
+
+        Args:
+            pred: A boolean (array) broadcastable against the focused value.
+            update: The function to apply to the focused value.
+
+        Returns:
+            A modified copy of the object.
+        """
+        return self.apply(
+            lambda old: jax.tree.map(lambda x, y: jnp.where(pred, x, y), update(old), old)
+        )
+
+    def at(self, where: Callable[[S], U]) -> Lens[T, U]:
+        """ Focus further into the focused value.
+
+        Args:
+            where: A function that retrieves a value from the focused value.
+
+        Returns:
+            A bound lens focusing through both accessors in a single traversal.
+        """
+        return Lens(self.obj, _Compose(self.where, where))
+
+    def at_index(self, index) -> ArrayLens[T, S]:
+        """ Focus on an index of the focused array(s).
+
+        Args:
+            index: Any index supported by `jax.Array.at`.
+
+        Returns:
+            A bound array lens.
+        """
+        return ArrayLens(self.obj, self.where, index)
     
 
-class Focused(eqx.Module, Generic[T]):
-    """ An object that can be focused on.
+@jax.tree_util.register_pytree_node_class
+@dataclass(frozen=True, slots=True)
+class FreeArrayLens(Generic[T, S]):
+    """ A lens that focuses on an index of arrays in an object.
+
+    The index is applied to every array leaf of the focused value. A
+    stacked integer array indexes a whole batch at once, so setting it
+    lowers to a single scatter.
+
+    Args:
+        where: A function that retrieves the focused array(s) from the object.
+        index: Any index supported by `jax.Array.at`.
+    """
+
+    where: Callable[[T], S]
+    index: Any
+
+    def tree_flatten(self):
+        return _flatten_index((), self.where, self.index)
+
+    @classmethod
+    def tree_unflatten(cls, aux, children):
+        (), where, index = _unflatten_index(aux, children)
+        return cls(where, index)
+
+    def get(self, obj: T, **kwargs) -> S:
+        """ Get the indexed value of the focus in the object.
+
+        Args:
+            obj: The object to query.
+            **kwargs: Passed on to `jax.Array.at[...].get`.
+
+        Returns:
+            The indexed focused value.
+        """
+        return self.bind(obj).get(**kwargs)
+
+    def set(self, obj: T, val: S, **kwargs) -> T:
+        """ Set the indexed value of the focus in the object.
+
+        Args:
+            obj: The object to modify.
+            val: The new value to set.
+            **kwargs: Passed on to `jax.Array.at[...].set`.
+
+        Returns:
+            A modified copy of the object.
+        """
+        return self.bind(obj).set(val, **kwargs)
+
+    def apply(self, obj: T, update: Callable[[S], S], **kwargs) -> T:
+        """ Apply a function to the indexed value of the focus in the object.
+
+        Args:
+            obj: The object to modify.
+            update: The function to apply to the indexed value. It receives the
+                whole indexed slice rather than single elements.
+            **kwargs: Passed on to `jax.Array.at[...].get`; `mode`,
+                `indices_are_sorted` and `unique_indices` also to `.set`.
+
+        Returns:
+            A modified copy of the object.
+        """
+        return self.bind(obj).apply(update, **kwargs)
+
+    def compiled_apply(self, obj: T, update: Callable[[S], S], **kwargs) -> T:
+        """ Like `apply`, but runs the indexed update as a cached jitted kernel.
+
+        Args:
+            obj: The object to modify.
+            update: The function to apply to the indexed value.
+            **kwargs: Passed on to `jax.Array.at[...].get`; `mode`,
+                `indices_are_sorted` and `unique_indices` also to `.set`.
+                Must be hashable.
+
+        Returns:
+            A modified copy of the object.
+        """
+        return self.bind(obj).compiled_apply(update, **kwargs)
+
+    def bind(self, obj: T) -> ArrayLens[T, S]:
+        """ Bind the lens to an object.
+
+        Args:
+            obj: The object to bind to.
+
+        Returns:
+            A bound array lens.
+        """
+        return ArrayLens(obj, self.where, self.index)
+
+
+@jax.tree_util.register_pytree_node_class
+@dataclass(frozen=True, slots=True)
+class ArrayLens(Generic[T, S]):
+    """ A lens that focuses on an index of arrays in a bound object.
+
+    The index is applied to every array leaf of the focused value. A
+    stacked integer array indexes a whole batch at once, so setting it
+    lowers to a single scatter.
 
     Args:
         obj: The object to focus on.
+        where: A function that retrieves the focused array(s) from the object.
+        index: Any index supported by `jax.Array.at`.
     """
+
     obj: T
+    where: Callable[[T], S]
+    index: Any
+
+    def tree_flatten(self):
+        return _flatten_index((self.obj,), self.where, self.index)
+
+    @classmethod
+    def tree_unflatten(cls, aux, children):
+        (obj,), where, index = _unflatten_index(aux, children)
+        return cls(obj, where, index)
+
+    def get(self, **kwargs) -> S:
+        """ Get the indexed value of the focus in the object.
+
+        Args:
+            **kwargs: Passed on to `jax.Array.at[...].get`.
+
+        Returns:
+            The indexed focused value.
+        """
+        index = self.index
+        return jax.tree_util.tree_map(lambda x: x.at[index].get(**kwargs), self.where(self.obj))
+
+    def set(self, val: S, **kwargs) -> T:
+        """ Set the indexed value of the focus in the object.
+
+        Args:
+            val: The new value to set.
+            **kwargs: Passed on to `jax.Array.at[...].set`.
+
+        Returns:
+            A modified copy of the object.
+        """
+        index = self.index
+
+        def _set(out):
+            if isinstance(out, jax.Array):
+                return out.at[index].set(val, **kwargs)
+            leaves, treedef = jax.tree_util.tree_flatten(out)
+            vals = treedef.flatten_up_to(val)
+            return treedef.unflatten([x.at[index].set(y, **kwargs) for x, y in zip(leaves, vals)])
+
+        return _tree_at_cached(self.where, self.obj, replace_fn=_set)
+
+    def apply(self, update: Callable[[S], S], **kwargs) -> T:
+        """ Apply a function to the indexed value of the focus in the object.
+
+        Args:
+            update: The function to apply to the indexed value. It receives the
+                whole indexed slice rather than single elements.
+            **kwargs: Passed on to `jax.Array.at[...].get`; `mode`,
+                `indices_are_sorted` and `unique_indices` also to `.set`.
+
+        Returns:
+            A modified copy of the object.
+        """
+        index = self.index
+
+        def _kernel(x):
+            return _index_update(x, index, update, **kwargs)
+
+        def _apply(out):
+            if isinstance(out, jax.Array):
+                return _kernel(out)
+            return jax.tree_util.tree_map(_kernel, out)
+
+        return _tree_at_cached(self.where, self.obj, replace_fn=_apply)
+
+    def compiled_apply(self, update: Callable[[S], S], **kwargs) -> T:
+        """ Like `apply`, but runs the indexed update as a cached jitted kernel.
+
+        Useful outside of `jax.jit`, where `apply` would dispatch the
+        gather/update/scatter op by op. Kernels are cached per update function,
+        the static parts of the index and keyword arguments; array parts of
+        the index are passed to the kernel instead of being baked in. Update
+        lambdas that read no closures, globals or default arguments are
+        matched by their code, so a fresh but identical lambda reuses the
+        kernel; any other `update` must be the same function object across
+        calls to hit the cache.
+
+        Args:
+            update: The function to apply to the indexed value.
+            **kwargs: Passed on to `jax.Array.at[...].get`; `mode`,
+                `indices_are_sorted` and `unique_indices` also to `.set`.
+                Must be hashable.
+
+        Returns:
+            A modified copy of the object.
+        """
+        options = tuple(sorted(kwargs.items()))
+        static_index, arrays = _split_index(self.index)
+        kernel = _index_kernel(_StaticWhere(update), static_index, options)
+        return _tree_at_cached(
+            self.where,
+            self.obj,
+            replace_fn=lambda out: jax.tree_util.tree_map(lambda x: kernel(x, arrays), out),
+        )
+
+
+class Focused(Generic[T]):
+    """ An object that can be focused on.
+
+    This is a transient builder for lenses and is not a pytree.
+
+    Args:
+        obj: The object to focus on.
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: T):
+        self.obj = obj
 
     def at(self, where: Callable[[T], S]) -> Lens[T, S]:
         """ Focus on a value in the object.
@@ -133,7 +823,56 @@ class Focused(eqx.Module, Generic[T]):
         """
         return Lens(self.obj, where)
 
+    def at_index(self, where: Callable[[T], S], index) -> ArrayLens[T, S]:
+        """ Focus on an index of a value in the object.
+
+        Args:
+            where: A function that retrieves the focused array(s) from the object.
+            index: Any index supported by `jax.Array.at`.
+
+        Returns:
+            A bound array lens.
+        """
+        return ArrayLens(self.obj, where, index)
+
+    def multi_set(self, updates: Iterable[tuple[Callable[[T], Any], Any]]) -> T:
+        """ Set several values in the object at once.
+
+        Args:
+            updates: Pairs of an accessor and the new value to set there.
+
+        Returns:
+            A modified copy of the object.
+        """
+        return multi_set(self.obj, updates)
+
 
 def focus(obj: T) -> Focused[T]:
     """ Focus on an object. """
-    return Focused(obj)
\ No newline at end of file
+    return Focused(obj)
+
+
+def multi_set(obj: T, updates: Iterable[tuple[Callable[[T], Any], Any]]) -> T:
+    """ Set several values in an object in a single flatten/unflatten pass.
+
+    Args:
+        obj: The object to modify.
+        updates: Pairs of an accessor and the new value to set there.
+
+    Returns:
+        A modified copy of the object.
+    """
+    updates = list(updates)
+    if not updates:
+        return obj
+    leaves, treedef = jax.tree_util.tree_flatten(obj)
+    indices = [_leaf_index(where, obj, leaves, treedef) for where, _ in updates]
+    if None in indices:
+        return eqx.tree_at(
+            lambda o: tuple(where(o) for where, _ in updates),
+            obj,
+            replace=tuple(val for _, val in updates),
+        )
+    for index, (_, val) in zip(indices, updates):
+        leaves[index] = val
+    return treedef.unflatten(leaves)
@@ -1,11 +1,14 @@
+import collections
 import re
 
 
 import equinox as eqx
 import jax
 import jax.numpy as jnp
+import pytest
 
-from optix import focus
+import optix
+from optix import ArrayLens, FreeArrayLens, FreeLens, Lens, focus
 
 class Foo(eqx.Module):
     a: jax.Array
@@ -40,4 +43,333 @@ def test_correct_hlo():
     hlo_verbose = re.sub(r"metadata=\{.*\}", "", hlo_verbose)
     hlo_lens = re.sub(r"metadata=\{.*\}", "", hlo_lens)
 
-    assert hlo_verbose == hlo_lens
\ No newline at end of file
+    assert hlo_verbose == hlo_lens
+
+def test_lens_pytree_roundtrip():
+    bar = Bar(x=jnp.array([1.0, 2.0, 3.0]), foo=Foo(a=jnp.array([1.0, 2.0, 3.0]), b='hello'))
+    lens = focus(bar).at(lambda x: x.foo.a)
+
+    leaves, treedef = jax.tree_util.tree_flatten(lens)
+    assert len(leaves) == len(jax.tree_util.tree_leaves(bar))
+
+    restored = jax.tree_util.tree_unflatten(treedef, leaves)
+    assert restored.where is lens.where
+    assert jnp.all(restored.get() == bar.foo.a)
+
+
+def test_chained_at():
+    bar = Bar(x=jnp.array([1.0, 2.0, 3.0]), foo=Foo(a=jnp.array([1.0, 2.0, 3.0]), b='hello'))
+
+    chained = focus(bar).at(lambda x: x.foo).at(lambda f: f.a).apply(jnp.cos)
+    direct = focus(bar).at(lambda x: x.foo.a).apply(jnp.cos)
+
+    assert jnp.all(chained.foo.a == direct.foo.a)
+    assert jnp.all(chained.x == bar.x)
+
+
+def test_free_lens_then():
+    bar = Bar(x=jnp.arange(3.0), foo=Foo(a=jnp.arange(3.0), b='hello'))
+
+    composed = FreeLens(lambda x: x.foo).then(FreeLens(lambda f: f.a))
+    direct = FreeLens(lambda x: x.foo.a)
+    assert jnp.all(composed.apply(bar, jnp.cos).foo.a == direct.apply(bar, jnp.cos).foo.a)
+
+    # a composed path through a tuple is not an attribute path of modules
+    model = (jnp.zeros(2), {"w": jnp.arange(2.0)})
+    composed = FreeLens(lambda t: t[1]).then(FreeLens(lambda d: d["w"]))
+    direct = FreeLens(lambda t: t[1]["w"])
+    new = composed.apply(model, jnp.negative)
+    assert jnp.all(new[1]["w"] == direct.apply(model, jnp.negative)[1]["w"])
+    assert new[0] is model[0]
+
+
+
+IDX = 0
+
+
+class Switch(eqx.Module):
+    a: jax.Array
+    b: jax.Array
+    flag: bool
+
+
+def test_cached_leaf_follows_closures():
+    model = (jnp.zeros(1), jnp.zeros(1), jnp.zeros(1))
+
+    i = 0
+    where = lambda t: t[i]
+    for i in range(3):
+        new = focus(model).at(where).set(jnp.ones(1))
+        assert [float(x[0]) for x in new] == [float(j == i) for j in range(3)]
+
+
+def test_cached_leaf_follows_globals():
+    global IDX
+    model = (jnp.zeros(1), jnp.zeros(1), jnp.zeros(1))
+
+    where = lambda t: t[IDX]
+    try:
+        for IDX in range(3):
+            new = focus(model).at(where).set(jnp.ones(1))
+            assert [float(x[0]) for x in new] == [float(j == IDX) for j in range(3)]
+    finally:
+        IDX = 0
+
+
+def test_source_identical_accessors_share_resolved_leaf():
+    model = (jnp.zeros(1), jnp.zeros(1))
+    first, second = [lambda t: t[1] for _ in range(2)]
+    assert first is not second
+
+    before = len(optix._LEAF_INDEX_BY_KEY)
+    for where in (first, second):
+        new = focus(model).at(where).set(jnp.ones(1))
+        assert [float(x[0]) for x in new] == [0.0, 1.0]
+    assert len(optix._LEAF_INDEX_BY_KEY) == before + 1
+
+
+def test_accessors_with_different_defaults_do_not_share_key():
+    zero = lambda t, *, k=0: t[k]
+    one = lambda t, *, k=1: t[k]
+    assert optix._where_key(zero) is None
+    assert optix._where_key(one) is None
+
+    # nested code reading a global has no key either
+    assert optix._where_key(lambda t: (lambda: t[IDX])()) is None
+
+
+def test_accessor_keys_distinguish_constants():
+    assert optix._where_key(lambda t: t[1]) != optix._where_key(lambda t: t[1.0])
+    assert optix._where_key(lambda t: t[1]) != optix._where_key(lambda t: t[True])
+    assert optix._where_key(lambda t: t * 0.0) != optix._where_key(lambda t: t * -0.0)
+    assert optix._where_key(lambda t: t[(1, 0.0)]) != optix._where_key(lambda t: t[(1.0, -0.0)])
+
+    lens = focus({"x": jnp.ones(4)}).at_index(lambda t: t["x"], slice(0, 2))
+    pos = lens.compiled_apply(lambda a: 1 / (a * 0.0))
+    neg = lens.compiled_apply(lambda a: 1 / (a * -0.0))
+    assert jnp.all(pos["x"] == jnp.array([jnp.inf, jnp.inf, 1.0, 1.0]))
+    assert jnp.all(neg["x"] == jnp.array([-jnp.inf, -jnp.inf, 1.0, 1.0]))
+
+
+USE_A = True
+
+
+class Pair(collections.namedtuple("Pair", ["a", "b"])):
+    @property
+    def active(self):
+        return self.a if USE_A else self.b
+
+
+def test_cached_leaf_follows_properties():
+    global USE_A
+    pair = Pair(a=jnp.zeros(1), b=jnp.zeros(1))
+    where = lambda t: t.active
+
+    try:
+        for USE_A in (True, False):
+            new = focus(pair).at(where).set(jnp.ones(1))
+            assert float(new.a[0]) == float(USE_A)
+            assert float(new.b[0]) == float(not USE_A)
+    finally:
+        USE_A = True
+
+
+def test_accessor_reading_leaf_is_rejected():
+    switch = Switch(a=jnp.zeros(1), b=jnp.zeros(1), flag=False)
+
+    with pytest.raises(ValueError, match="must not depend on the leaves"):
+        focus(switch).at(lambda m: m.a if m.flag else m.b).set(jnp.ones(1))
+
+
+def test_array_lens():
+    bar = Bar(x=jnp.arange(5.0), foo=Foo(a=jnp.array([1.0, 2.0, 3.0]), b='hello'))
+    indices = jnp.array([0, 2, 4])
+
+    lens = focus(bar).at_index(lambda x: x.x, indices)
+    assert jnp.all(lens.get() == bar.x[indices])
+    assert jnp.all(lens.set(jnp.zeros(3)).x == jnp.array([0.0, 1.0, 0.0, 3.0, 0.0]))
+    assert jnp.all(lens.apply(jnp.negative).x == jnp.array([-0.0, 1.0, -2.0, 3.0, -4.0]))
+
+    free = FreeLens(lambda x: x.foo.a).at_index(slice(1, None))
+    assert jnp.all(free.set(bar, -1.0).foo.a == jnp.array([1.0, -1.0, -1.0]))
+
+
+def test_array_lens_on_pytree():
+    tree = {"params": (jnp.arange(3.0), jnp.arange(3.0)), "step": jnp.array(0)}
+
+    new = focus(tree).at_index(lambda t: t["params"], 1).set((10.0, 20.0))
+    assert jnp.all(new["params"][0] == jnp.array([0.0, 10.0, 2.0]))
+    assert jnp.all(new["params"][1] == jnp.array([0.0, 20.0, 2.0]))
+
+
+class Linear(eqx.Module):
+    weight: jax.Array
+    bias: jax.Array
+
+    def __init__(self, n: int):
+        self.weight = jnp.ones((n, n))
+        self.bias = jnp.zeros(n)
+
+
+def test_attribute_path_set():
+    model = (Linear(2), Linear(3))
+
+    # custom __init__ is not re-run when rebuilding along an attribute path
+    new = focus(model[1]).at(lambda m: m.bias).set(jnp.ones(3))
+    assert isinstance(new, Linear)
+    assert jnp.all(new.bias == 1.0)
+    assert new.weight is model[1].weight
+
+    # paths through non-module nodes still go through the general route
+    new = focus(model).at(lambda m: m[0].bias).apply(lambda b: b + 1.0)
+    assert jnp.all(new[0].bias == 1.0)
+
+
+def test_closures_do_not_share_resolved_leaf():
+    model = (Linear(2), Linear(2))
+
+    def bias_of(i):
+        return lambda m: m[i].bias
+
+    for i in range(2):
+        new = focus(model).at(bias_of(i)).set(jnp.ones(2))
+        assert jnp.all(new[i].bias == 1.0)
+        assert jnp.all(new[1 - i].bias == 0.0)
+
+
+def test_identity_update_returns_object():
+    bar = Bar(x=jnp.arange(3.0), foo=Foo(a=jnp.arange(3.0), b='hello'))
+    assert focus(bar).at(lambda x: x.foo.a).apply(lambda a: a) is bar
+
+    model = (Linear(2),)
+    assert focus(model).at(lambda m: m[0].bias).apply(lambda b: b) is model
+
+
+def test_replace_if():
+    bar = Bar(x=jnp.arange(3.0), foo=Foo(a=jnp.arange(3.0), b='hello'))
+    new = focus(bar).at(lambda x: x.x).replace_if(bar.x > 0.5, jnp.negative)
+    assert jnp.all(new.x == jnp.array([0.0, -1.0, -2.0]))
+
+
+def test_multi_set():
+    bar = Bar(x=jnp.arange(3.0), foo=Foo(a=jnp.arange(3.0), b='hello'))
+
+    new = focus(bar).multi_set([
+        (lambda x: x.x, jnp.zeros(3)),
+        (lambda x: x.foo.a, jnp.ones(3)),
+    ])
+    assert jnp.all(new.x == 0.0)
+    assert jnp.all(new.foo.a == 1.0)
+
+    # accessors focusing subtrees are handled in a single eqx.tree_at call
+    new = focus(bar).multi_set([
+        (lambda x: x.x, jnp.zeros(3)),
+        (lambda x: x.foo, Foo(a=jnp.zeros(1), b='bye')),
+    ])
+    assert jnp.all(new.x == 0.0)
+    assert new.foo.b == 'bye'
+
+
+def test_compiled_apply():
+    bar = Bar(x=jnp.arange(5.0), foo=Foo(a=jnp.arange(3.0), b='hello'))
+
+    for index in (slice(1, 3), jnp.array([0, 4])):
+        lens = focus(bar).at_index(lambda x: x.x, index)
+        assert jnp.all(lens.compiled_apply(jnp.negative).x == lens.apply(jnp.negative).x)
+
+    # a fresh but identical update lambda reuses the compiled kernel
+    lens = focus(bar).at_index(lambda x: x.x, slice(1, 3))
+    lens.compiled_apply(lambda a: a * 2)
+    hits = optix._index_kernel.cache_info().hits
+    new = lens.compiled_apply(lambda a: a * 2)
+    assert optix._index_kernel.cache_info().hits == hits + 1
+    assert jnp.all(new.x == jnp.array([0.0, 2.0, 4.0, 3.0, 4.0]))
+
+
+def test_attribute_path_through_namedtuple():
+    Params = collections.namedtuple("Params", ["w", "b"])
+    params = Params(w=jnp.ones(2), b=jnp.zeros(2))
+
+    new = focus(params).at(lambda p: p.b).set(jnp.ones(2))
+    assert isinstance(new, Params)
+    assert jnp.all(new.b == 1.0)
+    assert new.w is params.w
+
+
+def test_lenses_have_no_instance_dict():
+    bar = Bar(x=jnp.arange(3.0), foo=Foo(a=jnp.arange(3.0), b='hello'))
+    where = lambda x: x.x
+
+    lenses = [
+        Lens(bar, where),
+        FreeLens(where),
+        ArrayLens(bar, where, 0),
+        FreeArrayLens(where, 0),
+        focus(bar),
+        focus(bar).at(lambda x: x.foo).at(lambda f: f.a),
+    ]
+    for lens in lenses:
+        assert not hasattr(lens, "__dict__")
+
+
+def test_array_lens_apply_sees_whole_slice():
+    bar = Bar(x=jnp.array([3.0, 1.0, 2.0, 0.0]), foo=Foo(a=jnp.arange(3.0), b='hello'))
+
+    new = focus(bar).at_index(lambda x: x.x, slice(0, 3)).apply(jnp.sort)
+    assert jnp.all(new.x == jnp.array([1.0, 2.0, 3.0, 0.0]))
+
+
+def test_lens_argument_does_not_retrace():
+    traces = []
+
+    @jax.jit
+    def apply_cos(lens):
+        traces.append(None)
+        return lens.apply(jnp.cos)
+
+    bar = Bar(x=jnp.arange(3.0), foo=Foo(a=jnp.arange(3.0), b='hello'))
+    for _ in range(3):
+        new = apply_cos(focus(bar).at(lambda x: x.foo.a))
+    assert len(traces) == 1
+    assert jnp.allclose(new.foo.a, jnp.cos(bar.foo.a))
+
+
+def test_lens_arguments_with_different_defaults_do_not_share_trace():
+    @jax.jit
+    def set_one(lens):
+        return lens.set(jnp.ones(1))
+
+    model = (jnp.zeros(1), jnp.zeros(1))
+    zero = set_one(Lens(model, lambda t, *, k=0: t[k]))
+    one = set_one(Lens(model, lambda t, *, k=1: t[k]))
+    assert [float(x[0]) for x in zero] == [1.0, 0.0]
+    assert [float(x[0]) for x in one] == [0.0, 1.0]
+
+
+def test_array_lens_apply_with_get_only_options():
+    bar = Bar(x=jnp.arange(3.0), foo=Foo(a=jnp.arange(3.0), b='hello'))
+    lens = focus(bar).at_index(lambda x: x.x, jnp.array([1, 5]))
+
+    for apply in (lens.apply, lens.compiled_apply):
+        new = apply(lambda a: a + 1.0, mode="fill", fill_value=0.0)
+        assert jnp.all(new.x == jnp.array([0.0, 2.0, 2.0]))
+
+
+def test_array_lens_with_mixed_index_crosses_jit():
+    model = {"w": jnp.zeros((2, 3))}
+    lens = focus(model).at_index(lambda m: m["w"], (slice(None), jnp.array([0, 2])))
+
+    leaves = jax.tree_util.tree_leaves(lens)
+    assert all(isinstance(leaf, jax.Array) for leaf in leaves)
+
+    new = jax.jit(lambda lens: lens.set(1.0))(lens)
+    assert jnp.all(new["w"] == jnp.array([[1.0, 0.0, 1.0], [1.0, 0.0, 1.0]]))
+
+
+def test_compiled_apply_with_mixed_index():
+    model = {"w": jnp.ones((2, 3))}
+    lens = focus(model).at_index(lambda m: m["w"], (slice(None), jnp.array([0, 2])))
+
+    compiled = lens.compiled_apply(lambda a: a * 2)
+    assert jnp.all(compiled["w"] == lens.apply(lambda a: a * 2)["w"])
+    assert jnp.all(compiled["w"] == jnp.array([[2.0, 1.0, 2.0], [2.0, 1.0, 2.0]]))